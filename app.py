@@ -1,9 +1,18 @@
-from flask import Flask, jsonify, request
+from flask import Flask, request
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated, Union
 import joblib
+import numpy as np
 import pandas as pd
 import json
+import re
+import threading
+import msgspec
+import orjson
 from werkzeug.exceptions import BadRequest
+from fastval import predict_tree, validate_numeric, validate_numeric_lock
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -11,6 +20,12 @@ app = Flask(__name__)
 # Set the logger level for Flask's logger
 app.logger.setLevel(logging.INFO)
 
+def ojsonify(obj, status=200):
+    """
+    Serialize an object to a JSON response with orjson; NumPy arrays are written without conversion.
+    """
+    return app.response_class(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), status=status, mimetype='application/json')
+
 # Define the type mapping from strings to Python types
 type_mapping = {
     "int": int,
@@ -28,150 +43,353 @@ except FileNotFoundError:
     app.logger.error("features.json file not found. Please ensure it exists in the project directory.")
     raise SystemExit("features.json file is missing. Application cannot start without it.")
 except Exception as e:
-    app.logger.error(f"Error loading expected features: {str(e)}")
+    app.logger.error("Error loading expected features: %s", e)
     raise SystemExit(e)
 
+# Precompute the views of the schema used on every request
+EXPECTED_KEYS_TUPLE = tuple(expected_features)
+EXPECTED_KEYS_SET = frozenset(expected_features)
+EXPECTED_TYPES = tuple(expected_features.values())
+NUMERIC_FIELDS = frozenset(field for field, field_type in expected_features.items() if field_type in (int, float))
+EXPECTED_COLUMNS = pd.Index(EXPECTED_KEYS_TUPLE)
+
+# Magnitudes from here up round to infinity in the float32 model input; this is half a float32 ulp above its
+# maximum, less the half float64 ulp that ints lose on their way through float64
+FLOAT32_OVERFLOW = 2 ** 128 - 2 ** 103 - 2 ** 74
+
+# Numeric fields are bounded so every decoded value is finite in the float32 model input; msgspec only takes int64
+# bounds for ints, which is well inside that range, and anything larger falls back to the detailed validators
+_NUMERIC_META = {
+    int: msgspec.Meta(ge=0, le=int(np.iinfo(np.int64).max)),
+    float: msgspec.Meta(ge=0, lt=float(FLOAT32_OVERFLOW)),
+}
+
+# Typed record schema for msgspec; JSON keys are mapped onto positional names since some are not identifiers
+_record_names = [f"field_{j}" for j in range(len(EXPECTED_KEYS_TUPLE))]
+Record = msgspec.defstruct(
+    "Record",
+    [
+        (name, Annotated[field_type, _NUMERIC_META[field_type]] if field in NUMERIC_FIELDS else field_type)
+        for name, field, field_type in zip(_record_names, EXPECTED_KEYS_TUPLE, EXPECTED_TYPES)
+    ],
+    rename=dict(zip(_record_names, EXPECTED_KEYS_TUPLE)),
+    forbid_unknown_fields=True,
+)
+_records_decoder = msgspec.json.Decoder(Union[Record, list[Record]])
+
+# Partition the expected features by type so whole columns can be checked at once
+int_cols = [field for field, field_type in zip(EXPECTED_KEYS_TUPLE, EXPECTED_TYPES) if field_type is int]
+numeric_cols = [field for field in EXPECTED_KEYS_TUPLE if field in NUMERIC_FIELDS]
+
+# Batches at least this large are checked by the compiled kernel, which outweighs its dispatch overhead
+NUMBA_MIN_RECORDS = 256
+
+# Compile the kernel now so the first large batch does not pay for it
+validate_numeric(np.zeros((1, len(EXPECTED_KEYS_TUPLE)), dtype=np.float32))
+
+@dataclass(frozen=True)
+class CompactTree:
+    """
+    Decision tree stored as flat arrays with integer thresholds, as exported by source/production.py.
+    """
+    feature: np.ndarray
+    threshold: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    value: np.ndarray
+
+    def predict(self, X):
+        """
+        Predict the target for each row of the float32 feature array X.
+        """
+        return predict_tree(X, self.feature, self.threshold, self.left, self.right, self.value)
+
 # Load the trained model
 try:
-    model = joblib.load('home_price_model.pkl')
+    # Memory-map the tree arrays so worker processes share the same physical pages
+    model = CompactTree(**joblib.load('home_price_tree.pkl', mmap_mode='r'))
+    # Run one dummy inference so the first request does not pay for the cold prediction path
+    model.predict(np.zeros((1, len(EXPECTED_KEYS_TUPLE)), dtype=np.float32))
 except Exception as e:
-    app.logger.error(f"Error loading model: {str(e)}")
+    app.logger.error("Error loading model: %s", e)
     raise SystemExit(e)
 
+# Each worker thread keeps one feature row for single-record predictions instead of allocating per request
+_thread_local = threading.local()
+
+def _feature_row():
+    """
+    Return the calling thread's reusable (1, F) float32 feature row.
+    """
+    row = getattr(_thread_local, 'row', None)
+    if row is None:
+        row = np.empty((1, len(EXPECTED_KEYS_TUPLE)), dtype=np.float32)
+        _thread_local.row = row
+    return row
+
+@lru_cache(maxsize=4096)
+def _predict_one(values):
+    """
+    Predict a single validated record; the tree is deterministic, so repeated records are served from the cache.
+    """
+    row = _feature_row()
+    row[0] = values
+    return float(model.predict(row)[0])
+
+# Error messages that mean the request body was not valid JSON
+_JSON_ERR_RE = re.compile(r'Failed to decode JSON object|Expecting value')
+
+# The invalid JSON error body is serialized once; responses are mutable, so one is still built per request
+_BAD_JSON_BODY = orjson.dumps({"success": False, "error": "Invalid JSON input format"})
+
 @app.errorhandler(BadRequest)
 def handle_bad_request(e):
-    app.logger.error(f"BadRequest error: {str(e)}")
+    message = str(e)
+    app.logger.error("BadRequest error: %s", message)
     # Check if the error is due to invalid JSON payload
-    if "Failed to decode JSON object" in str(e) or "Expecting value" in str(e):
-        return jsonify({"success": False, "error": "Invalid JSON input format"}), 400
+    if _JSON_ERR_RE.search(message):
+        return app.response_class(_BAD_JSON_BODY, status=400, mimetype='application/json')
     else:
         # Return the error description for other BadRequest errors
-        return jsonify({"success": False, "error": str(e.description)}), e.code
+        return ojsonify({"success": False, "error": str(e.description)}, e.code)
 
 @app.route('/')
 def hello():
-    app.logger.info('Main endpoint processing HTTP request')
-    return jsonify({"success": True, "message": "Hello, World!"})
+    # Per-request entry messages are debug only; gunicorn's access log already records every request
+    app.logger.debug('Main endpoint processing HTTP request')
+    return ojsonify({"success": True, "message": "Hello, World!"})
 
-def validate_input_data(input_data_list, expected_features):
+def validate_records(input_data_list, _keys=EXPECTED_KEYS_TUPLE, _key_set=EXPECTED_KEYS_SET,
+                     _types=EXPECTED_TYPES, _numeric=NUMERIC_FIELDS, _float32_overflow=FLOAT32_OVERFLOW,
+                     _isinstance=isinstance):
     """
-    Validate each input record in the input data list for missing or extra fields and null values.
+    Validate each input record and return its values in the expected column order.
+
+    Used for single-record requests, where checking the fields directly is cheaper than building a DataFrame.
+    The schema is bound through default arguments so the loops read locals instead of module globals.
     """
+    rows = []
     for idx, input_data in enumerate(input_data_list):
-        if input_data is None:
-            return False, f"Record {idx}: No input data provided"
+        if not _isinstance(input_data, dict):
+            return None, f"Record {idx}: No input data provided"
 
-        # Check for missing and extra fields
-        missing_fields = [field for field in expected_features if field not in input_data]
-        extra_fields = [field for field in input_data if field not in expected_features]
+        # Check for missing fields; the ordered list is only built for the error message
+        missing = _key_set.difference(input_data)
+        if missing:
+            missing_fields = [field for field in _keys if field in missing]
+            return None, f"Record {idx}: Missing required fields: {missing_fields}"
 
-        if missing_fields:
-            return False, f"Record {idx}: Missing required fields: {missing_fields}"
+        # With no fields missing, a record can only hold extra fields if it has more keys than expected
+        if len(input_data) != len(_key_set):
+            extra = input_data.keys() - _key_set
+            extra_fields = [field for field in input_data if field in extra]
+            return None, f"Record {idx}: Unexpected fields provided: {extra_fields}"
 
-        if extra_fields:
-            return False, f"Record {idx}: Unexpected fields provided: {extra_fields}"
+        # Check for nulls, convert each value to its expected type and check numeric values are non-negative
+        # in a single pass over the fields; problems are collected so every offending field is reported
+        values = []
+        null_fields = []
+        type_errors = []
+        invalid_values = []
+        for field, expected_type in zip(_keys, _types):
+            value = input_data[field]
+            value_type = type(value)
+            # Values that already have the expected type are used as is; only the rest are converted
+            if value_type is expected_type:
+                pass
+            elif value is None:
+                null_fields.append(field)
+                continue
+            elif expected_type is float and value_type is int:
+                value = float(value)
+            else:
+                try:
+                    value = expected_type(value)
+                except (ValueError, TypeError):
+                    type_errors.append(f"Field '{field}' must be of type {expected_type.__name__} (got value '{value}')")
+                    continue
+            if field in _numeric:
+                # Values the float32 feature row cannot hold are type errors, as in validate_and_build_array
+                if not -_float32_overflow < value < _float32_overflow:
+                    type_errors.append(
+                        f"Field '{field}' must be of type {expected_type.__name__} (got value '{input_data[field]}')"
+                    )
+                    continue
+                if value < 0:
+                    invalid_values.append(f"Field '{field}' must be a non-negative number")
+            values.append(value)
 
-        # Check for null values in required fields
-        null_fields = [field for field in expected_features if input_data.get(field) is None]
         if null_fields:
-            return False, f"Record {idx}: Fields cannot be null: {null_fields}"
+            return None, f"Record {idx}: Fields cannot be null: {null_fields}"
 
-    return True, ""
+        if type_errors:
+            return None, f"Record {idx}: Invalid input format: Type errors - {', '.join(type_errors)}"
 
-def check_data_types_and_values(input_data_list, expected_features):
+        if invalid_values:
+            return None, f"Record {idx}: Invalid values: {', '.join(invalid_values)}"
+
+        rows.append(tuple(values))
+
+    return rows, None
+
+def _parse_int_string(value):
     """
-    Check data types and values of each input record in the input data list.
+    Convert a string cell with int(); strings int() rejects become NaN and other cells are returned unchanged.
     """
+    if type(value) is not str:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return np.nan
+
+def validate_and_build_array(input_data_list, expected_features=expected_features, _keys=EXPECTED_KEYS_TUPLE,
+                             _key_set=EXPECTED_KEYS_SET, _columns=EXPECTED_COLUMNS, _numeric_cols=numeric_cols,
+                             _int_cols=int_cols, _numba_min_records=NUMBA_MIN_RECORDS,
+                             _validate_numeric=validate_numeric, _lock=validate_numeric_lock,
+                             _parse_int_string=_parse_int_string):
+    """
+    Validate the list of input records and build the float32 model input array.
+
+    The checks run column-wise on a single DataFrame instead of record by record. Only the first
+    offending record is reported. The schema is bound through default arguments, as in validate_records.
+    """
+    if not input_data_list:
+        return None, "No input data provided"
+
+    # Every record must be a JSON object
     for idx, input_data in enumerate(input_data_list):
-        type_errors = []
-        invalid_values = []
+        if not isinstance(input_data, dict):
+            return None, f"Record {idx}: No input data provided"
 
-        for field, expected_type in expected_features.items():
-            value = input_data.get(field)
-            if value is None:
-                type_errors.append(f"Field '{field}' cannot be null")
-                continue
+    input_df = pd.DataFrame(input_data_list)
 
-            # Attempt to convert the value to the expected type
-            try:
-                original_value = value
-                value = expected_type(value)
-                input_data[field] = value  # Update input_data with the converted value
+    # A record has a schema problem if one of its expected columns is empty (the field is missing or null) or it
+    # holds a different number of fields than expected (extra fields); only the lowest such record is reported
+    input_df = input_df.reindex(columns=_columns)
+    field_counts = np.fromiter(map(len, input_data_list), dtype=np.intp, count=len(input_data_list))
+    schema_rows = (input_df.isna().to_numpy().any(axis=1) | (field_counts != len(_key_set))).nonzero()[0]
+    if schema_rows.size:
+        # Within that record, missing fields take precedence over extra fields, which take precedence over nulls
+        idx = int(schema_rows[0])
+        input_data = input_data_list[idx]
+        missing = _key_set - input_data.keys()
+        if missing:
+            missing_fields = [field for field in _keys if field in missing]
+            return None, f"Record {idx}: Missing required fields: {missing_fields}"
+        if len(input_data) != len(_key_set):
+            extra_fields = [field for field in input_data if field not in _key_set]
+            return None, f"Record {idx}: Unexpected fields provided: {extra_fields}"
+        null_fields = [field for field in _keys if input_data[field] is None]
+        return None, f"Record {idx}: Fields cannot be null: {null_fields}"
 
-                # If the expected type is numeric, check if the value is non-negative
-                if expected_type in [int, float] and value < 0:
-                    invalid_values.append(f"Field '{field}' must be a non-negative number")
-            except (ValueError, TypeError):
-                type_errors.append(f"Field '{field}' must be of type {expected_type.__name__} (got value '{original_value}')")
+    # Strings in int columns are converted with int() itself, as validate_records does; pd.to_numeric alone would
+    # accept "2.5" or "1e3" and reject digits int() allows, such as other scripts' decimal digits
+    for field in _int_cols:
+        column = input_df[field]
+        if column.dtype == object:
+            input_df[field] = column.map(_parse_int_string)
 
-        if type_errors:
-            return False, f"Record {idx}: Invalid input format: Type errors - {', '.join(type_errors)}"
+    # Coerce the numeric columns; values that cannot be converted become NaN
+    if _numeric_cols:
+        input_df[_numeric_cols] = input_df[_numeric_cols].apply(pd.to_numeric, errors='coerce')
 
-        if invalid_values:
-            return False, f"Record {idx}: Invalid values: {', '.join(invalid_values)}"
+        # Match int() semantics by truncating towards zero before the range check
+        if _int_cols:
+            input_df[_int_cols] = np.trunc(input_df[_int_cols])
 
-    return True, ""
+    # Copy the columns into a contiguous float32 array in the model's feature order
+    model_input = np.empty((len(input_df), len(_keys)), dtype=np.float32, order='C')
+    # Values too large for float32 overflow to infinity on purpose; they are reported as type errors below
+    with np.errstate(over='ignore'):
+        for j, field in enumerate(_keys):
+            model_input[:, j] = input_df[field].to_numpy()
 
-def convert_to_dataframe(input_data_list, expected_features):
-    """
-    Convert the list of validated input records to a pandas DataFrame.
-    """
-    try:
-        # Create DataFrame with columns in the expected order
-        input_df = pd.DataFrame(input_data_list, columns=expected_features.keys())
-        return input_df, None
-    except Exception as e:
-        return None, str(e)
+    # Locate the first record with a value that could not be converted or is negative
+    if len(model_input) >= _numba_min_records:
+        with _lock:
+            idx, _ = _validate_numeric(model_input)
+    else:
+        rows = (~np.isfinite(model_input) | (model_input < 0)).any(axis=1).nonzero()[0]
+        idx = rows[0] if rows.size else -1
+
+    if idx >= 0:
+        # Within that record, type errors are reported before negative values, as in validate_records
+        idx = int(idx)
+        row = model_input[idx]
+        not_finite = ~np.isfinite(row)
+        if not_finite.any():
+            field = _keys[not_finite.argmax()]
+            return None, (
+                f"Record {idx}: Invalid input format: Type errors - Field '{field}' must be of type "
+                f"{expected_features[field].__name__} (got value '{input_data_list[idx][field]}')"
+            )
+        field = _keys[(row < 0).argmax()]
+        return None, f"Record {idx}: Invalid values: Field '{field}' must be a non-negative number"
+
+    return model_input, None
 
 @app.route('/predict', methods=['POST'])
-def predict():
-    app.logger.info('Inference endpoint processing HTTP request')
+def predict(_model=model, _orjson_loads=orjson.loads, _isinstance=isinstance, _np_array=np.array,
+            _decode_records=_records_decoder.decode, _astuple=msgspec.structs.astuple):
+    # Hot names are bound as default arguments so they resolve as locals on every request
+    app.logger.debug('Inference endpoint processing HTTP request')
+    body = request.get_data(cache=False)
+    rows = model_input = None
 
-    # Attempt to get JSON data from the request
+    # Step 1: Validate the input data and build the float32 model input
     try:
-        input_data = request.get_json()
+        # Well-formed payloads are parsed, type checked and range checked in a single msgspec pass
+        records = _decode_records(body)
+    except msgspec.DecodeError:
+        # Anything msgspec rejects goes through the validators below, which describe what is wrong
+        records = None
+    if records is not None and not _isinstance(records, list):
+        records = [records]
+
+    if records:
+        rows = [_astuple(record) for record in records]
+    else:
+        # Attempt to parse the JSON payload from the raw request body
+        try:
+            input_data = _orjson_loads(body)
+        except orjson.JSONDecodeError as e:
+            app.logger.error("Invalid JSON payload: %s", e)
+            input_data = None
         if input_data is None:
-            raise BadRequest("No JSON input provided or invalid JSON format.")
-    except BadRequest as e:
-        app.logger.error(f"BadRequest exception: {str(e)}")
-        return jsonify({"success": False, "error": "Invalid JSON input format"}), 400
-
-    # Ensure input_data is a list
-    if not isinstance(input_data, list):
-        # If a single record is provided as a dictionary, wrap it in a list
-        if isinstance(input_data, dict):
-            input_data = [input_data]
+            return app.response_class(_BAD_JSON_BODY, status=400, mimetype='application/json')
+
+        # Ensure input_data is a list
+        if not _isinstance(input_data, list):
+            # If a single record is provided as a dictionary, wrap it in a list
+            if _isinstance(input_data, dict):
+                input_data = [input_data]
+            else:
+                app.logger.error("Input data must be a list of records or a single record object.")
+                return ojsonify({"success": False, "error": "Input data must be a list of records or a single record object."}, 400)
+
+        if len(input_data) == 1:
+            # A single record skips the DataFrame; its validated values are the prediction cache key
+            rows, error_message = validate_records(input_data)
         else:
-            app.logger.error("Input data must be a list of records or a single record object.")
-            return jsonify({"success": False, "error": "Input data must be a list of records or a single record object."}), 400
-
-    # Step 1: Validate input data for missing or extra fields
-    is_valid, error_message = validate_input_data(input_data, expected_features)
-    if not is_valid:
-        app.logger.error(f"Input validation error: {error_message}")
-        return jsonify({"success": False, "error": error_message}), 400
-
-    # Step 2: Check data types and values
-    is_valid, error_message = check_data_types_and_values(input_data, expected_features)
-    if not is_valid:
-        app.logger.error(f"Data type/value validation error: {error_message}")
-        return jsonify({"success": False, "error": error_message}), 400
-
-    # Step 3: Convert the input data to a DataFrame
-    input_df, error = convert_to_dataframe(input_data, expected_features)
-    if error:
-        app.logger.error(f"Error converting input data to DataFrame: {error}")
-        return jsonify({"success": False, "error": f"Invalid input format: {error}"}), 400
-
-    # Step 4: Perform prediction using the loaded model
+            model_input, error_message = validate_and_build_array(input_data)
+        if error_message:
+            app.logger.error("Input validation error: %s", error_message)
+            return ojsonify({"success": False, "error": error_message}, 400)
+
+    # Step 2: Perform prediction using the loaded model
     try:
-        predictions = model.predict(input_df)
-        app.logger.info(f"Predictions made successfully: {predictions.tolist()}")
-        return jsonify({"success": True, "predictions": predictions.tolist()})
+        if rows is not None and len(rows) == 1:
+            predictions = _np_array([_predict_one(rows[0])])
+        else:
+            if model_input is None:
+                model_input = _np_array(rows, dtype=np.float32)
+            predictions = _model.predict(model_input)
+        # Only stringify the predictions when the message will actually be emitted
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("Predictions made successfully: %s", predictions.tolist())
+        # predictions is a contiguous float64 array, which orjson writes straight from its buffer
+        return ojsonify({"success": True, "predictions": predictions})
     except Exception as e:
-        app.logger.error(f"Error making predictions: {str(e)}")
-        return jsonify({"success": False, "error": f"Prediction failed: {str(e)}"}), 500
-
-if __name__ == '__main__':
-    # Run the Flask app on host 0.0.0.0 and port 50505
-    app.run(debug=True, host='0.0.0.0', port=50505)
\ No newline at end of file
+        app.logger.error("Error making predictions: %s", e)
+        return ojsonify({"success": False, "error": f"Prediction failed: {str(e)}"}, 500)
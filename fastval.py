@@ -0,0 +1,50 @@
+import threading
+import numpy as np
+from numba import njit, prange
+
+@njit(cache=True, parallel=True)
+def validate_numeric(X):
+    """
+    Return the (row, column) of the first value in X that is negative or not finite, or (-1, -1).
+
+    Rows are flagged in parallel; the first flagged row is then rescanned serially so the
+    reported position does not depend on thread scheduling.
+    """
+    n_rows, n_cols = X.shape
+    bad_rows = np.zeros(n_rows, dtype=np.bool_)
+    for i in prange(n_rows):
+        for j in range(n_cols):
+            value = X[i, j]
+            if value < 0 or not np.isfinite(value):
+                bad_rows[i] = True
+                break
+
+    for i in range(n_rows):
+        if bad_rows[i]:
+            for j in range(n_cols):
+                value = X[i, j]
+                if value < 0 or not np.isfinite(value):
+                    return i, j
+    return -1, -1
+
+# gthread workers may run several batches at once; TBB makes numba's threading layer safe for that, and this lock
+# keeps the fallback workqueue layer, which aborts on concurrent parallel launches, safe when TBB is unavailable
+validate_numeric_lock = threading.Lock()
+
+@njit(cache=True, nogil=True)
+def predict_tree(X, feature, threshold, left, right, value):
+    """
+    Walk each row of X down a compact tree and return the value of the leaf it reaches.
+
+    Leaves are the nodes whose left child is the node itself.
+    """
+    predictions = np.empty(X.shape[0], dtype=value.dtype)
+    for i in range(X.shape[0]):
+        node = 0
+        while left[node] != node:
+            if X[i, feature[node]] <= threshold[node]:
+                node = left[node]
+            else:
+                node = right[node]
+        predictions[i] = value[node]
+    return predictions
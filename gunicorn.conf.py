@@ -0,0 +1,21 @@
+import os
+
+# Gunicorn settings used to serve the API in production
+
+bind = '0.0.0.0:50505'
+
+# Load the app in the master so features, the memory-mapped tree and the compiled kernels are shared with every worker
+preload_app = True
+
+# Threaded workers let one request decode and validate JSON while another runs inference
+workers = 2 * (os.cpu_count() or 1) + 1
+worker_class = 'gthread'
+threads = 4
+
+# The workers already cover every core, so each runs numba's parallel kernels on one thread instead of a pool sized
+# to all of them; this is read when numba is imported, so it has to be set before the app is preloaded
+os.environ.setdefault('NUMBA_NUM_THREADS', '1')
+
+# Log requests and errors to stdout/stderr
+accesslog = '-'
+errorlog = '-'
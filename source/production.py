@@ -1,34 +1,44 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.metrics import mean_absolute_error
 import joblib
+from joblib import Parallel, delayed
 
-def load_data(file_path):
-    """Load dataset from a CSV file and return a DataFrame."""
-    data = pd.read_csv(file_path)
-    return data
+FEATURES = ['LotArea', 'YearBuilt', '1stFlrSF', '2ndFlrSF', 'FullBath', 'BedroomAbvGr', 'TotRmsAbvGrd']
+TARGET = 'SalePrice'
 
-def preprocess_data(data):
-    """Extract relevant features and target variable for training."""
-    features = ['LotArea', 'YearBuilt', '1stFlrSF', '2ndFlrSF', 'FullBath', 'BedroomAbvGr', 'TotRmsAbvGrd']
-    X = data[features]  # Feature matrix
-    y = data['SalePrice']  # Target variable
+def load_features(file_path):
+    """Load the model features and target variable from a CSV file as NumPy arrays."""
+    # Parse only the needed columns, with fixed dtypes so pandas skips type inference
+    data = pd.read_csv(
+        file_path,
+        usecols=FEATURES + [TARGET],
+        dtype={**{feature: 'int32' for feature in FEATURES}, TARGET: 'float64'},
+        engine='c',
+    )
+    # Train on float32 features, the same dtype the API passes to the model
+    X = data[FEATURES].to_numpy(dtype=np.float32)  # Feature matrix
+    y = data[TARGET].to_numpy()  # Target variable
     return X, y
 
+def fit_and_score(max_leaf_nodes, X_train, y_train, X_val, y_val):
+    """Fit a Decision Tree Regressor with the given max_leaf_nodes and return its validation MAE."""
+    model = DecisionTreeRegressor(max_leaf_nodes=max_leaf_nodes, random_state=1)
+    model.fit(X_train, y_train)
+    predictions = model.predict(X_val)
+    return max_leaf_nodes, mean_absolute_error(y_val, predictions)
+
 def find_best_tree_size(X_train, y_train, X_val, y_val):
     """Find the optimal max_leaf_nodes for Decision Tree Regressor by comparing MAE values."""
-    best_size = None
-    best_mae = float("inf")
-    # Iterate through different max_leaf_nodes values to find the best one
-    for max_leaf_nodes in [5, 25, 50, 100, 250, 500, 5000]:
-        model = DecisionTreeRegressor(max_leaf_nodes=max_leaf_nodes, random_state=1)
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_val)
-        mae = mean_absolute_error(y_val, predictions)
-        if mae < best_mae:
-            best_mae = mae
-            best_size = max_leaf_nodes
+    # Fit the candidate trees concurrently, one per process
+    results = Parallel(n_jobs=-1, prefer='processes')(
+        delayed(fit_and_score)(max_leaf_nodes, X_train, y_train, X_val, y_val)
+        for max_leaf_nodes in [5, 25, 50, 100, 250, 500, 5000]
+    )
+    # min keeps the first candidate on ties, like the original strict comparison
+    best_size = min(results, key=lambda result: result[1])[0]
     return best_size
 
 def train_model(X_train, y_train, best_leaf_nodes):
@@ -37,6 +47,23 @@ def train_model(X_train, y_train, best_leaf_nodes):
     model.fit(X_train, y_train)
     return model
 
+def compact_tree(model):
+    """Export the fitted tree as flat arrays with integer thresholds for the API's CompactTree."""
+    tree = model.tree_
+    is_leaf = tree.children_left == -1
+    nodes = np.arange(tree.node_count)
+    # Unsigned indices let the compiled traversal skip negative-index handling
+    index_dtype = np.uint16 if tree.node_count <= np.iinfo(np.uint16).max else np.uint32
+    return {
+        "feature": np.where(is_leaf, 0, tree.feature).astype(np.uint8),
+        # Every feature is integer valued, so x <= t is the same test as x <= floor(t)
+        "threshold": np.where(is_leaf, 0, np.floor(tree.threshold)).astype(np.int32),
+        # Leaves are marked by pointing back to themselves
+        "left": np.where(is_leaf, nodes, tree.children_left).astype(index_dtype),
+        "right": np.where(is_leaf, nodes, tree.children_right).astype(index_dtype),
+        "value": tree.value[:, 0, 0].copy(),
+    }
+
 def evaluate_model(model, X_val, y_val):
     """Evaluate the trained model using Mean Absolute Error (MAE)."""
     predictions = model.predict(X_val)
@@ -47,9 +74,8 @@ def main():
     """Main function to execute the model training pipeline."""
     file_path = "home_price_data.csv"  # Update with actual path if needed
     
-    # Load and preprocess data
-    data = load_data(file_path)
-    X, y = preprocess_data(data)
+    # Load the features and target variable
+    X, y = load_features(file_path)
     
     # Split data into training and validation sets
     X_train, X_val, y_train, y_val = train_test_split(X, y, random_state=1, test_size=0.2)
@@ -69,8 +95,12 @@ def main():
     
     # Save the trained model
     
-    joblib.dump(model, 'home_price_model.pkl')
+    joblib.dump(model, 'home_price_model.pkl', compress=0)
     print("Model saved as 'home_price_model.pkl'")
+    
+    # Save the compact tree served by the API; it must stay uncompressed so it can be memory-mapped
+    joblib.dump(compact_tree(model), 'home_price_tree.pkl', compress=0)
+    print("Compact tree saved as 'home_price_tree.pkl'")
 
 if __name__ == "__main__":
     main()
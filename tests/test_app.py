@@ -1,11 +1,13 @@
 import sys
 import os
 import pytest
+import joblib
+import numpy as np
 
 # Add the project root directory to sys.path to ensure the 'app' module can be imported
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app  # Import the Flask app from application
+from app import app, model, _predict_one  # Import the Flask app, the served model and the cached predictor
 
 @pytest.fixture
 def client():
@@ -194,4 +196,284 @@ def test_predict_endpoint_bad_json_input(client):
     assert response_json['success'] is False  # 'success' should be False
 
     # Assert that the error message indicates invalid JSON input
-    assert response_json['error'] == 'Invalid JSON input format'  # Error should be about invalid JSON
\ No newline at end of file
+    assert response_json['error'] == 'Invalid JSON input format'  # Error should be about invalid JSON
+
+def test_predict_endpoint_multiple_records(client):
+    """
+    Test the '/predict' endpoint with a batch of valid records.
+
+    Sends a POST request with a list of records and verifies that one prediction is returned per record.
+    """
+    input_data = [
+        {
+            "LotArea": 7500,
+            "YearBuilt": 2010,
+            "1stFlrSF": 920,
+            "2ndFlrSF": 880,
+            "FullBath": 2,
+            "BedroomAbvGr": 4,
+            "TotRmsAbvGrd": 9
+        },
+        {
+            "LotArea": 6200,
+            "YearBuilt": 1998,
+            "1stFlrSF": 780,
+            "2ndFlrSF": 760,
+            "FullBath": 1,
+            "BedroomAbvGr": 3,
+            "TotRmsAbvGrd": 7
+        }
+    ]
+    # Send a POST request with a batch of records
+    response = client.post('/predict', json=input_data)
+    assert response.status_code == 200  # Expect a 200 OK status code
+    predictions = response.json["predictions"]
+    assert len(predictions) == 2, "There should be one prediction per record"
+
+def test_predict_endpoint_multiple_records_invalid_record(client):
+    """
+    Test the '/predict' endpoint with a batch where only the second record is invalid.
+
+    Verifies that the error message points at the offending record and field.
+    """
+    valid_record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 2,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    invalid_record = dict(valid_record, FullBath="two")  # Invalid data type in the second record
+    # Send a POST request with one invalid record in the batch
+    response = client.post('/predict', json=[valid_record, invalid_record])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == (
+        "Record 1: Invalid input format: Type errors - Field 'FullBath' must be of type int (got value 'two')"
+    )
+
+def test_predict_endpoint_multiple_records_non_integer_string(client):
+    """
+    Test the '/predict' endpoint with a batch where an integer field is sent as a decimal string.
+
+    Verifies that the batch validator rejects strings that int() rejects, like the single-record validator.
+    """
+    valid_record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 2,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    invalid_record = dict(valid_record, FullBath="2.5")  # Not an integer literal
+    # Send a POST request with one invalid record in the batch
+    response = client.post('/predict', json=[valid_record, invalid_record])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == (
+        "Record 1: Invalid input format: Type errors - Field 'FullBath' must be of type int (got value '2.5')"
+    )
+
+def test_predict_endpoint_multiple_records_oversized_integer(client):
+    """
+    Test the '/predict' endpoint with a batch where an integer field does not fit in int64.
+
+    Verifies that the batch validator still returns a JSON error for the first offending record.
+    """
+    valid_record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 2,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    # Send a POST request with a negative value and an integer too large for int64
+    response = client.post('/predict', json=[dict(valid_record, FullBath=-1), dict(valid_record, FullBath=2 ** 63)])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == "Record 0: Invalid values: Field 'FullBath' must be a non-negative number"
+
+def test_predict_endpoint_multiple_records_unicode_digits(client):
+    """
+    Test the '/predict' endpoint with an integer field sent as a string of non-ASCII decimal digits.
+
+    int() accepts these, so the batch validator must accept them like the single-record validator does.
+    """
+    valid_record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 3,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    expected = client.post('/predict', json=[valid_record, valid_record]).json["predictions"]
+    arabic_indic_record = dict(valid_record, FullBath="\u0663")  # Arabic-Indic digit three
+    # Send a POST request with the digit as a single record and in a batch
+    response = client.post('/predict', json=arabic_indic_record)
+    assert response.status_code == 200  # Expect a 200 OK status code
+    assert response.json["predictions"] == expected[:1]
+    response = client.post('/predict', json=[valid_record, arabic_indic_record])
+    assert response.status_code == 200  # Expect a 200 OK status code
+    assert response.json["predictions"] == expected
+
+def test_predict_endpoint_multiple_records_first_schema_error(client):
+    """
+    Test the '/predict' endpoint with a batch where both records have schema problems.
+
+    Verifies that the first offending record is reported, even when a later record has a different problem.
+    """
+    valid_record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 2,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    missing_record = {field: value for field, value in valid_record.items() if field != "FullBath"}
+    extra_record = dict(valid_record, Foo=1)  # Unexpected field in the second record
+    # Send a POST request where the first record is missing a field and the second has an extra one
+    response = client.post('/predict', json=[missing_record, extra_record])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == "Record 0: Missing required fields: ['FullBath']"
+
+    # A null in the first record is reported before an extra field in the second
+    response = client.post('/predict', json=[dict(valid_record, FullBath=None), extra_record])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == "Record 0: Fields cannot be null: ['FullBath']"
+
+def test_predict_endpoint_large_batch_invalid_values(client):
+    """
+    Test the '/predict' endpoint with a batch large enough to be validated by the compiled kernel.
+
+    Verifies that a negative value deep inside the batch is reported with its record index.
+    """
+    record = {
+        "LotArea": 7500,
+        "YearBuilt": 2010,
+        "1stFlrSF": 920,
+        "2ndFlrSF": 880,
+        "FullBath": 2,
+        "BedroomAbvGr": 4,
+        "TotRmsAbvGrd": 9
+    }
+    input_data = [dict(record) for _ in range(300)]
+    input_data[290]["TotRmsAbvGrd"] = -1  # Invalid value (negative number) near the end of the batch
+    # Send a POST request with the large batch
+    response = client.post('/predict', json=input_data)
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == "Record 290: Invalid values: Field 'TotRmsAbvGrd' must be a non-negative number"
+
+def test_predict_endpoint_repeated_record_is_cached(client):
+    """
+    Test that repeating a single-record request is served from the prediction cache.
+
+    Sends the same record twice and verifies that the second prediction is a cache hit with the same value.
+    """
+    input_data = {
+        "LotArea": 9600,
+        "YearBuilt": 1976,
+        "1stFlrSF": 1262,
+        "2ndFlrSF": 0,
+        "FullBath": 2,
+        "BedroomAbvGr": 3,
+        "TotRmsAbvGrd": 6
+    }
+    first = client.post('/predict', json=input_data)
+    hits = _predict_one.cache_info().hits
+    second = client.post('/predict', json=input_data)
+    assert second.status_code == 200  # Expect a 200 OK status code
+    assert _predict_one.cache_info().hits == hits + 1  # The repeated record should hit the cache
+    assert second.json["predictions"] == first.json["predictions"]  # Cached prediction matches the original
+
+def test_compact_tree_matches_sklearn_model():
+    """
+    Test that the compact tree served by the API predicts exactly what the trained sklearn model predicts.
+
+    Compares both models on random integer-valued feature rows covering the range of the training data.
+    """
+    sklearn_model = joblib.load('home_price_model.pkl')
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 80000, size=(2000, 7)).astype(np.float32)
+    X[:, 1] = rng.integers(1870, 2011, size=2000)  # YearBuilt
+    X[:, 4:] = rng.integers(0, 15, size=(2000, 3))  # FullBath, BedroomAbvGr, TotRmsAbvGrd
+    np.testing.assert_array_equal(model.predict(X), sklearn_model.predict(X, check_input=False))
+
+def test_compact_tree_is_memory_mapped():
+    """
+    Test that the compact tree arrays are memory-mapped from disk rather than copied into each worker.
+    """
+    for array in (model.feature, model.threshold, model.left, model.right, model.value):
+        assert isinstance(array, np.memmap)
+
+def test_predict_endpoint_numeric_strings(client):
+    """
+    Test the '/predict' endpoint with numbers sent as strings.
+
+    The typed fast path rejects these, so they must fall back to the detailed validators, which
+    convert them and return the same prediction as the integer input.
+    """
+    input_data = {
+        "LotArea": 8450,
+        "YearBuilt": 2003,
+        "1stFlrSF": 856,
+        "2ndFlrSF": 854,
+        "FullBath": 2,
+        "BedroomAbvGr": 3,
+        "TotRmsAbvGrd": 8
+    }
+    expected = client.post('/predict', json=input_data).json["predictions"]
+    # Send a POST request with every value encoded as a string
+    response = client.post('/predict', json={field: str(value) for field, value in input_data.items()})
+    assert response.status_code == 200  # Expect a 200 OK status code
+    assert response.json["predictions"] == expected  # Same prediction as the integer input
+
+def test_predict_endpoint_value_too_large_for_float32(client):
+    """
+    Test the '/predict' endpoint with a value that overflows the float32 model input.
+
+    Verifies that the single-record and batch validators both reject it as a type error.
+    """
+    input_data = {
+        "LotArea": 1e300,  # Converts to an int, but becomes infinite as float32
+        "YearBuilt": 2003,
+        "1stFlrSF": 856,
+        "2ndFlrSF": 854,
+        "FullBath": 2,
+        "BedroomAbvGr": 3,
+        "TotRmsAbvGrd": 8
+    }
+    expected_error = "Invalid input format: Type errors - Field 'LotArea' must be of type int (got value '1e+300')"
+    # Send a POST request with the value as a single record and in a batch
+    response = client.post('/predict', json=input_data)
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == f"Record 0: {expected_error}"
+    response = client.post('/predict', json=[input_data, input_data])
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert response.json["error"] == f"Record 0: {expected_error}"
+
+def test_predict_endpoint_integer_too_large_for_float32(client):
+    """
+    Test the '/predict' endpoint with a well-typed integer that overflows the float32 model input.
+
+    The typed fast path must not accept it; the detailed validators report it as a type error.
+    """
+    input_data = {
+        "LotArea": 8450,
+        "YearBuilt": 2003,
+        "1stFlrSF": 856,
+        "2ndFlrSF": 854,
+        "FullBath": 2,
+        "BedroomAbvGr": 3,
+        "TotRmsAbvGrd": 8
+    }
+    # Send a POST request with an integer beyond the float32 range
+    response = client.post('/predict', json=dict(input_data, LotArea=2 ** 128))
+    assert response.status_code == 400  # Expect a 400 Bad Request status code
+    assert "Type errors - Field 'LotArea' must be of type int" in response.json["error"]
@@ -0,0 +1 @@
+from app import app  # WSGI entry point for gunicorn: gunicorn -c gunicorn.conf.py wsgi:app